@@ -1,16 +1,30 @@
 import json
 import argparse
 import re
-from utils import list_files, build_context_snippets
-from gemini_direct import call_gemini_direct, themes_prompt
+from utils import iter_files, iter_context_snippets, IMAGE_EXTS, DEFAULT_CACHE_DIR
+from pathlib import Path
+from gemini_direct import (
+    call_gemini_direct, themes_prompt, directory_summary_prompt, latency_summary,
+    encode_snippets_json, encode_snippets_compact, payload_cost, resolve_evidence_refs, PAYLOAD_FORMATS, BACKENDS
+)
+from hierarchy import hierarchical_items
+from image_dedup import iter_unique_images
 from render import render_ascii_board, render_html
 from image_generator import generate_vision_board_image
 
-def _shrink_for_size(items, max_chars=8000, min_per_file=60, start_per_file=120, step=20):
+SUMMARY_CHARS = 320  # room for a directory summary in hierarchical mode
+COUNT_RESERVE = 99  # near-duplicate count assumed when costing an image snippet
+SELECT_POLICIES = ("cap", "fill")  # cap: first --max-files that fit; fill: as many as the budget allows
+
+def _shrink_for_size(items, max_chars=8000, min_per_file=60, start_per_file=120, step=20, encode=None):
     """
-    Trim each file's snippet so the final JSON stays under max_chars.
+    Trim each file's snippet so the encoded payload stays under max_chars.
     Keeps structure stable for the prompt while avoiding Windows arg/STDIN slowdowns.
+    encode defaults to the JSON list encoding. Only the snippet is trimmed; the
+    encoder appends the near-duplicate count after it, so that never gets cut.
     """
+    if encode is None:
+        encode = encode_snippets_json
     per_file = start_per_file
     while True:
         shrunk = [
@@ -18,50 +32,155 @@ def _shrink_for_size(items, max_chars=8000, min_per_file=60, start_per_file=120,
                 "path": it["path"],
                 "name": it["name"],
                 "snippet": (it.get("snippet") or "")[:per_file],
+                "count": it.get("count", 1),
             }
             for it in items
         ]
-        s = json.dumps(shrunk, ensure_ascii=False)
+        s = encode(shrunk)
         if len(s) <= max_chars or per_file <= min_per_file:
             return shrunk, s
         per_file -= step
 
+def _encode_payload(items, fmt, root, max_chars=8000, start_per_file=120):
+    """Shrink items to max_chars in the chosen format. Returns (text, refs)."""
+    if fmt == "compact":
+        encode = lambda xs: encode_snippets_compact(xs, root)[0]
+        items, _ = _shrink_for_size(items, max_chars=max_chars, start_per_file=start_per_file, encode=encode)
+        return encode_snippets_compact(items, root)
+    _, text = _shrink_for_size(items, max_chars=max_chars, start_per_file=start_per_file)
+    return text, {}
+
+def _pack_stream(items, fmt, root, max_chars=8000, min_per_file=60, max_items=None):
+    """
+    Pull snippet items until the payload budget is full. Each item is costed
+    at min_per_file chars (the narrowest width _shrink_for_size goes to), and
+    pulling stops at max_items or when the next item would not fit. The
+    upstream generators are closed right away, so nothing past that point is
+    walked or read. Returns (packed, pulled, stopped_early).
+    """
+    packed, pulled, used, seen_dirs = [], 0, 2, set()  # 2: the JSON list brackets
+    stopped = False
+    try:
+        for it in items:
+            pulled += 1
+            narrow = dict(it, snippet=(it.get("snippet") or "")[:min_per_file])
+            if it.get("ext") in IMAGE_EXTS:
+                # Burst sizes are only known once the stream closes; reserve room for the suffix
+                narrow["count"] = max(it.get("count", 1), COUNT_RESERVE)
+            dirs = set(seen_dirs)
+            cost = payload_cost(narrow, fmt, root, dirs)
+            if used + cost > max_chars:
+                stopped = True
+                break
+            packed.append(it)
+            used += cost
+            seen_dirs = dirs
+            if max_items and len(packed) >= max_items:
+                stopped = True
+                break
+    finally:
+        close = getattr(items, "close", None)
+        if close:
+            close()
+    return packed, pulled, stopped
+
+def _scan_items(args, root):
+    """
+    Flat mode: stream files through dedup, extraction and packing, stopping
+    as soon as the packer is full. Returns (items, image_counts) where
+    image_counts maps evidence refs of representative images to the number
+    of near-duplicate shots they stand for.
+    """
+    print(f"[scan] Streaming: {args.root} (select: {args.select})")
+    counts = {}
+    paths = iter_files(args.root)
+    if not args.no_image_dedup:
+        paths = iter_unique_images(paths, counts, root, args.cache_dir)
+    # Read only what _shrink_for_size will keep (it starts at 120 chars per file)
+    snippets = iter_context_snippets(paths, per_file_chars=120)
+    max_items = args.max_files if args.select == "cap" else None
+    packed, pulled, stopped = _pack_stream(snippets, args.prompt_format, root, max_chars=8000, max_items=max_items)
+    print(f"[scan] Packed {len(packed)} of {pulled} files read" + ("; packer full, stopped scanning early" if stopped else ""))
+    folded = sum(n - 1 for n in counts.values())
+    if folded:
+        print(f"[scan] Folded {folded} near-duplicate images into {sum(1 for n in counts.values() if n > 1)} representatives")
+
+    # Duplicate counts are only final once the stream is closed, so they are
+    # attached here; the payload encoder appends them after the snippet
+    compact = []
+    image_counts = {}
+    for it in packed:
+        p = Path(it["path"])
+        n = counts.get(p, 1)
+        compact.append({"path": it["path"], "name": it["name"], "snippet": it["snippet"], "count": n})
+        if n > 1:
+            # The board looks images up by the evidence ref the model cites. A bare
+            # file name only resolves for files directly under the root, and camera
+            # names repeat across folders, so deeper files use the relative path only
+            image_counts[p.relative_to(root).as_posix()] = n
+            if p.parent == root:
+                image_counts[p.name] = n
+
+    if not compact:
+        print("[warn] No readable files found; the model will have nothing to go on.")
+    return compact, image_counts
+
+def _hierarchical_scan_items(args, root):
+    """Hierarchical mode: cached per-directory summaries, regenerated only where content changed."""
+    print(f"[hier] Hashing tree: {args.root}")
+
+    def summarize(rel_dir, items):
+        text, _ = _encode_payload(items, args.prompt_format, root, max_chars=4000, start_per_file=SUMMARY_CHARS)
+        print(f"[hier] Summarizing {rel_dir}/ ({len(items)} entries)")
+        prompt = directory_summary_prompt(rel_dir, text, fmt=args.prompt_format)
+        return call_gemini_direct(prompt, model=args.model, backend=args.backend)
+
+    items, stats = hierarchical_items(root, summarize, args.cache_dir, key_salt=f"{args.model}:{args.prompt_format}")
+    print(f"[hier] Files: {stats.get('files', 0)}  directories: {stats.get('dirs', 0)}  "
+          f"summaries reused: {stats.get('reused', 0)}  regenerated: {stats.get('regenerated', 0)}")
+    return items
+
 def main():
     ap = argparse.ArgumentParser(description="Generate a future-self vision board from local files.")
     ap.add_argument("root", help="Folder to scan (e.g., ~/Documents or ./demo_data)")
-    ap.add_argument("--max-files", type=int, default=80, help="Cap number of files to sample")
+    ap.add_argument("--max-files", type=int, default=80, help="Cap number of files to sample (with --select cap)")
+    ap.add_argument("--select", choices=SELECT_POLICIES, default="cap",
+                    help="cap: first --max-files files that fit the prompt budget; fill: as many files as the budget holds")
     ap.add_argument("--model", default="gemini-2.5-flash", help="Gemini model (e.g., gemini-2.5-flash or gemini-2.5-pro)")
     ap.add_argument("--out", default="vision-board.html", help="Output HTML file")
     ap.add_argument("--no-ascii", action="store_true", help="Skip terminal ASCII board")
     ap.add_argument("--generate-image", action="store_true", help="Generate vision board image (requires OPENAI_API_KEY)")
     ap.add_argument("--image-out", default="vision-board.png", help="Output image file")
+    ap.add_argument("--prompt-format", choices=PAYLOAD_FORMATS, default="json",
+                    help="Snippet payload encoding (compact groups files by directory and fits more files)")
+    ap.add_argument("--backend", choices=sorted(BACKENDS), default="cli",
+                    help="How to reach Gemini: cli (gemini CLI via stdin) or http (REST API, needs GOOGLE_API_KEY)")
+    ap.add_argument("--hierarchical", action="store_true",
+                    help="Summarize every folder bottom-up and cache summaries by content hash (incremental re-runs)")
+    ap.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="Where hierarchical summaries are cached")
+    ap.add_argument("--no-image-dedup", action="store_true",
+                    help="Keep every photo instead of folding near-duplicate bursts into one representative")
     args = ap.parse_args()
 
     # ----- Scan & build snippets -----
-    print(f"[scan] Walking: {args.root}")
-    paths = list_files(args.root, max_files=args.max_files)
-    print(f"[scan] Sampled files: {len(paths)}")
-
-    print("[scan] Extracting text/metadata…")
-    snippets = build_context_snippets(paths)
-    print(f"[scan] Built {len(snippets)} snippets")
-
-    # Minimal payload for the model
-    compact = [{"path": s["path"], "name": s["name"], "snippet": s.get("snippet", "")} for s in snippets]
-
-    # Fallback if nothing readable (e.g., image-only PDFs): use filenames as weak signals
-    if not compact:
-        print("[warn] No readable text extracted; falling back to filenames only.")
-        compact = [{"path": str(p), "name": p.name, "snippet": p.stem} for p in paths]
+    root = Path(args.root).expanduser().resolve()
+    image_counts = {}
+    if args.hierarchical:
+        compact = _hierarchical_scan_items(args, root)
+        per_file = SUMMARY_CHARS
+    else:
+        compact, image_counts = _scan_items(args, root)
+        per_file = 120
 
     # Cap prompt size for snappy API calls
-    compact, snippets_json = _shrink_for_size(compact, max_chars=8000)
+    snippets_json, refs = _encode_payload(compact, args.prompt_format, root, max_chars=8000, start_per_file=per_file)
     print(f"[gemini] Prompt chars: {len(snippets_json)}")
     print(f"[gemini] Calling model: {args.model}")
 
     # ----- Build prompt & call Gemini CLI -----
-    prompt = themes_prompt(snippets_json)
-    raw = call_gemini_direct(prompt, model=args.model)
+    prompt = themes_prompt(snippets_json, fmt=args.prompt_format)
+    raw = call_gemini_direct(prompt, model=args.model, backend=args.backend)
+    print(f"[gemini] {latency_summary(args.backend)}")
     
     # Debug: Show what we got back
     print(f"[debug] Raw response length: {len(raw)}")
@@ -83,12 +202,17 @@ def main():
             raise RuntimeError("Model output was not valid JSON and no JSON block was found.\n---\n" + raw[:1000])
         analysis = json.loads(m.group(0))
 
+    # Map file ids cited as evidence back to real files
+    if refs:
+        resolve_evidence_refs(analysis, refs)
+
     # ----- Render outputs -----
     if not args.no_ascii:
         print()
         print(render_ascii_board(analysis))
 
-    out = render_html(analysis, out_path=args.out, source_folder=args.root, generate_ai_images=args.generate_image)
+    out = render_html(analysis, out_path=args.out, source_folder=args.root, generate_ai_images=args.generate_image,
+                      image_counts=image_counts)
     print(f"[done] Wrote {out}")
 
     # ----- Generate vision board image (optional) -----
@@ -1,7 +1,11 @@
 import os
+import re
 import json
+import time
 import subprocess
+from abc import ABC, abstractmethod
 import tempfile
+from pathlib import Path
 from textwrap import dedent
 
 DEFAULT_MODEL = "gemini-2.5-flash"
@@ -12,21 +16,23 @@ def call_gemini_cli(prompt: str, model: str = DEFAULT_MODEL) -> str:
     Requires gemini CLI to be installed and authenticated.
     """
     try:
-        # Build the gemini CLI command using -p flag for prompt
+        # The prompt goes over stdin (non-interactive mode) rather than argv,
+        # so large prompts don't run into ARG_MAX / Windows command-line limits
         cmd = [
             'gemini',
             '--model', model,
-            '--prompt', prompt
         ]
         
         print(f"[debug] Calling Gemini CLI with model: {model}")
-        print(f"[debug] Command: gemini --model {model} --prompt [PROMPT_TEXT]")
+        print(f"[debug] Command: gemini --model {model} < [PROMPT_TEXT]")
         
         # Execute the CLI command
         result = subprocess.run(
             cmd,
+            input=prompt,
             capture_output=True,
             text=True,
+            encoding="utf-8",
             timeout=60
         )
         
@@ -68,12 +74,104 @@ def call_gemini_cli(prompt: str, model: str = DEFAULT_MODEL) -> str:
     except Exception as e:
         raise RuntimeError(f"Unexpected error calling Gemini CLI: {e}")
 
+# ----- Backends -----
+# A backend turns (prompt, model) into the model's text output. "cli" shells
+# out to the gemini CLI per call; "http" talks to the Gemini REST API over a
+# pooled keep-alive session, which skips process startup on every call.
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+
+class GeminiBackend(ABC):
+    name = "base"
+
+    def __init__(self):
+        self.latencies = []  # seconds per call, for comparing backends
+
+    @abstractmethod
+    def generate(self, prompt: str, model: str = DEFAULT_MODEL) -> str:
+        """Return the model's text output for prompt."""
+
+class CLIBackend(GeminiBackend):
+    name = "cli"
+
+    def generate(self, prompt: str, model: str = DEFAULT_MODEL) -> str:
+        return call_gemini_cli(prompt, model)
+
+class HTTPBackend(GeminiBackend):
+    """
+    Gemini REST API (models/<model>:generateContent). Reads GOOGLE_API_KEY or
+    GEMINI_API_KEY; GEMINI_BASE_URL overrides the endpoint (e.g. a local mock).
+    """
+    name = "http"
+
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: int = 60, pool_size: int = 8):
+        super().__init__()
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.api_key = api_key or os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
+        if not self.api_key:
+            raise RuntimeError("GOOGLE_API_KEY (or GEMINI_API_KEY) is required for the http backend")
+        self.base_url = (base_url or os.environ.get("GEMINI_BASE_URL") or GEMINI_API_BASE).rstrip("/")
+        self.timeout = timeout
+        self._requests = requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"x-goog-api-key": self.api_key, "Content-Type": "application/json"})
+
+    def generate(self, prompt: str, model: str = DEFAULT_MODEL) -> str:
+        url = f"{self.base_url}/models/{model}:generateContent"
+        payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        try:
+            resp = self.session.post(url, json=payload, timeout=self.timeout)
+        except self._requests.exceptions.Timeout:
+            raise RuntimeError(f"Gemini API call timed out after {self.timeout} seconds")
+        except self._requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Network error calling Gemini API: {e}")
+        if resp.status_code != 200:
+            raise RuntimeError(f"Gemini API failed (HTTP {resp.status_code}): {resp.text[:500]}")
+        try:
+            parts = resp.json()["candidates"][0]["content"]["parts"]
+        except (ValueError, KeyError, IndexError):
+            raise RuntimeError(f"Unexpected Gemini API response: {resp.text[:500]}")
+        output = "".join(p.get("text", "") for p in parts).strip()
+        if not output:
+            raise RuntimeError("Gemini API returned empty output")
+        return output
+
+BACKENDS = {"cli": CLIBackend, "http": HTTPBackend}
+_backend_instances = {}
+
+def get_backend(name: str = "cli", api_key: str = None) -> GeminiBackend:
+    """Return a shared backend instance so HTTP connections are reused across calls."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown Gemini backend: {name} (choose from {', '.join(BACKENDS)})")
+    if name not in _backend_instances:
+        _backend_instances[name] = HTTPBackend(api_key=api_key) if name == "http" else BACKENDS[name]()
+    return _backend_instances[name]
+
+def latency_summary(name: str = "cli") -> str:
+    backend = _backend_instances.get(name)
+    if not backend or not backend.latencies:
+        return f"backend={name} calls=0"
+    ms = sorted(x * 1000 for x in backend.latencies)
+    return (f"backend={name} calls={len(ms)} mean_ms={sum(ms) / len(ms):.0f} "
+            f"p50_ms={ms[(len(ms) - 1) // 2]:.0f} max_ms={ms[-1]:.0f}")
+
 # Keep the old function name for compatibility
-def call_gemini_direct(prompt: str, model: str = DEFAULT_MODEL, api_key: str = None) -> str:
+def call_gemini_direct(prompt: str, model: str = DEFAULT_MODEL, api_key: str = None, backend: str = "cli") -> str:
     """
-    Wrapper for backward compatibility - now uses CLI instead of direct API.
+    Call Gemini through the selected backend ("cli" by default) and log the call latency.
     """
-    return call_gemini_cli(prompt, model)
+    b = get_backend(backend, api_key=api_key)
+    start = time.perf_counter()
+    try:
+        return b.generate(prompt, model)
+    finally:
+        elapsed = time.perf_counter() - start
+        b.latencies.append(elapsed)
+        print(f"[gemini] backend={b.name} latency_ms={elapsed * 1000:.0f} prompt_chars={len(prompt)}")
 
 SCHEMA_JSON = dedent("""
 Return ONLY strict minified JSON with this schema:
@@ -92,7 +190,102 @@ Return ONLY strict minified JSON with this schema:
 }
 """).strip()
 
-def themes_prompt(snippets_json: str) -> str:
+# ----- Snippet payload encodings -----
+# "json" is the original list of {path, name, snippet} objects. "compact"
+# groups files under a directory header (relative to the scan root) and gives
+# each file a short id, so deep trees don't spend the budget on repeated
+# absolute prefixes and JSON punctuation.
+PAYLOAD_FORMATS = ("json", "compact")
+
+PAYLOAD_INTROS = {
+    "json": "Here are up to ~80 sampled files/snippets as JSON:",
+    "compact": (
+        "Here are sampled files/snippets grouped by directory.\n"
+        "Legend: a line \"D <dir>\" starts a directory (relative to the scanned folder); "
+        "each following line is \"<id> <file name>: <snippet>\". "
+        "Cite evidence by file id (e.g. \"f3\")."
+    ),
+}
+
+EVIDENCE_GUIDELINES = {
+    "json": "Each theme should cite 1-3 evidence refs (file names or short phrases).",
+    "compact": "Each theme should cite 1-3 evidence refs, using the file ids from the listing (e.g. \"f3\").",
+}
+
+_REF_ID = re.compile(r"^\s*\[?(f\d+)\b")
+
+def _rel_ref(path: str, root) -> str:
+    p = Path(path)
+    if root is not None:
+        try:
+            return p.relative_to(root).as_posix()
+        except ValueError:
+            pass
+    return p.as_posix()
+
+def snippet_text(item: dict) -> str:
+    """The snippet as sent to the model: an image standing for a burst of
+    near-duplicates (item["count"] > 1) gets the burst size appended."""
+    snippet = item.get("snippet") or ""
+    count = item.get("count", 1)
+    return f"{snippet} • {count} similar shots" if count > 1 else snippet
+
+def encode_snippets_json(items) -> str:
+    return json.dumps(
+        [{"path": it["path"], "name": it["name"], "snippet": snippet_text(it)} for it in items],
+        ensure_ascii=False,
+    )
+
+def encode_snippets_compact(items, root=None):
+    """
+    Encode snippet items as directory-grouped lines.
+    Returns (text, refs) where refs maps each file id to its path relative to root.
+    """
+    groups = {}
+    for it in items:
+        rel = _rel_ref(it["path"], root)
+        parent = rel.rpartition("/")[0] or "."
+        groups.setdefault(parent, []).append(it)
+
+    lines, refs = [], {}
+    for parent, members in groups.items():
+        lines.append(f"D {parent}")
+        for it in members:
+            ref = f"f{len(refs) + 1}"
+            refs[ref] = _rel_ref(it["path"], root)
+            snippet = " ".join(snippet_text(it).split())
+            lines.append(f"{ref} {it['name']}: {snippet}")
+    return "\n".join(lines), refs
+
+def payload_cost(item: dict, fmt: str = "json", root=None, seen_dirs: set = None) -> int:
+    """
+    Characters item adds to the encoded payload, so a packer can budget one
+    item at a time. For "compact", seen_dirs tracks which directory headers
+    are already paid for and is updated in place.
+    """
+    snippet = snippet_text(item)
+    if fmt == "compact":
+        rel = _rel_ref(item["path"], root)
+        parent = rel.rpartition("/")[0] or "."
+        cost = len(f"f0000 {item['name']}: {' '.join(snippet.split())}") + 1
+        if seen_dirs is not None and parent not in seen_dirs:
+            seen_dirs.add(parent)
+            cost += len(f"D {parent}") + 1
+        return cost
+    entry = {"path": item["path"], "name": item["name"], "snippet": snippet}
+    return len(json.dumps(entry, ensure_ascii=False)) + 2  # ", " separator
+
+def resolve_evidence_refs(analysis: dict, refs: dict) -> dict:
+    """Replace file ids cited as evidence (e.g. "f3") with their relative paths."""
+    for theme in analysis.get("themes", []):
+        resolved = []
+        for ev in theme.get("evidence", []):
+            m = _REF_ID.match(ev) if isinstance(ev, str) else None
+            resolved.append(refs.get(m.group(1), ev) if m else ev)
+        theme["evidence"] = resolved
+    return analysis
+
+def themes_prompt(snippets_json: str, fmt: str = "json") -> str:
     return f"""
 You are an identity mining & motivation assistant that creates visual vision boards.
 You receive local file names and short snippets (private; never exfiltrate).
@@ -103,7 +296,7 @@ Ground your inferences in the evidence you see.
 
 Guidelines:
 - Prefer concrete, domain-specific themes (e.g., "Quant Finance", "AI Engineering", "Classical Music")
-- Each theme should cite 1-3 evidence refs (file names or short phrases).
+- {EVIDENCE_GUIDELINES[fmt]}
 - Affirmations should be short, present-tense, identity-based ("I am…" "I consistently…").
 - Action prompts are 1-sentence nudges the user can do today.
 
@@ -119,6 +312,21 @@ For each theme, create a vision_board_scenes entry with:
   
 Example: If files show scuba diving photos, the image_description should be: "A confident scuba diver in crystal-clear tropical waters, surrounded by vibrant coral reefs and exotic marine life, wearing professional diving gear, with sunlight streaming through the water creating magical rays, representing mastery of underwater exploration and marine adventure"
 
-Here are up to ~80 sampled files/snippets as JSON:
+{PAYLOAD_INTROS[fmt]}
+{snippets_json}
+"""
+
+def directory_summary_prompt(dir_label: str, snippets_json: str, fmt: str = "json") -> str:
+    """Prompt for one folder's summary in hierarchical mode (plain text, not JSON)."""
+    return f"""
+You summarize one folder of a user's local files (private; never exfiltrate).
+Folder: {dir_label}
+Entries ending in "/" are subfolders; their snippet is that subfolder's own summary.
+
+In at most 2 sentences (under 300 characters), say what this folder shows about
+the user's interests, skills, projects and goals. Name concrete topics and tools.
+Return plain text only: no JSON, no markdown, no preamble.
+
+{PAYLOAD_INTROS[fmt]}
 {snippets_json}
 """
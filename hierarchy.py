@@ -0,0 +1,138 @@
+"""
+Incremental, bottom-up directory summaries.
+
+Every directory gets a Merkle hash built from its files' content hashes and
+its subdirectories' hashes. A directory's model summary is cached under that
+hash, so after a small edit only the directories on the path from the changed
+file up to the scan root hash differently and need a new model call.
+"""
+import os
+import hashlib
+from pathlib import Path
+from utils import TEXT_EXTS, IMAGE_EXTS, build_context_snippets, root_cache_path, load_json_cache, save_json_cache
+
+SUMMARY_VERSION = "1"  # bump when the summary prompt changes to invalidate caches
+MAX_FILES_PER_DIR = 40
+HASH_CHUNK = 1024 * 1024
+
+def file_digest(path: Path, st: os.stat_result, hash_cache: dict) -> str:
+    """Content hash of a file, reused while its size and mtime are unchanged."""
+    key = str(path)
+    cached = hash_cache.get(key)
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+        return cached[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    hash_cache[key] = [st.st_size, st.st_mtime_ns, digest]
+    return digest
+
+def build_tree(path: Path, hash_cache: dict):
+    """
+    Return {"path", "files", "dirs", "hash"} for path, or None if nothing
+    under it is a file we would read. Symlinked directories are not followed.
+    """
+    files, dirs = [], []
+    try:
+        entries = sorted(os.scandir(path), key=lambda e: e.name)
+    except OSError:
+        return None
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                child = build_tree(Path(entry.path), hash_cache)
+                if child:
+                    dirs.append(child)
+            elif entry.is_file():
+                ext = Path(entry.name).suffix.lower()
+                if ext in TEXT_EXTS or ext in IMAGE_EXTS:
+                    p = Path(entry.path)
+                    files.append((p, file_digest(p, entry.stat(), hash_cache)))
+        except OSError:
+            continue  # unreadable entry; leave it out of the hash
+    if not files and not dirs:
+        return None
+    h = hashlib.sha256()
+    for p, digest in files:
+        h.update(f"f {p.name} {digest}\n".encode("utf-8"))
+    for child in dirs:
+        h.update(f"d {child['path'].name} {child['hash']}\n".encode("utf-8"))
+    return {"path": path, "files": files, "dirs": dirs, "hash": h.hexdigest()}
+
+def summarize_node(node: dict, root: Path, summarize, summaries: dict, used: set, stats: dict,
+                   key_salt: str = "", per_file_chars: int = 120) -> str:
+    """
+    Summarize node bottom-up. summarize(rel_dir, items) makes the model call;
+    items are {"path", "name", "snippet"} dicts for the directory's files and
+    its subdirectories (whose snippet is their own summary).
+    """
+    child_items = []
+    for child in node["dirs"]:
+        text = summarize_node(child, root, summarize, summaries, used, stats, key_salt, per_file_chars)
+        if text:
+            child_items.append({"path": str(child["path"]), "name": child["path"].name + "/", "snippet": text})
+
+    key = hashlib.sha256(f"{SUMMARY_VERSION}:{key_salt}:{node['hash']}".encode("utf-8")).hexdigest()
+    used.add(key)
+    stats["dirs"] = stats.get("dirs", 0) + 1
+    if key in summaries:
+        stats["reused"] = stats.get("reused", 0) + 1
+        return summaries[key]
+
+    paths = [p for p, _ in node["files"][:MAX_FILES_PER_DIR]]
+    items = [
+        {"path": s["path"], "name": s["name"], "snippet": s["snippet"]}
+        for s in build_context_snippets(paths, per_file_chars=per_file_chars)
+    ]
+    rel = node["path"].relative_to(root).as_posix() if node["path"] != root else "."
+    text = " ".join((summarize(rel, items + child_items) or "").split())
+    summaries[key] = text
+    stats["regenerated"] = stats.get("regenerated", 0) + 1
+    return text
+
+def hierarchical_items(root: str, summarize, cache_dir: Path, key_salt: str = "", per_file_chars: int = 120):
+    """
+    Build prompt items for themes_prompt from per-directory summaries.
+    The scan root's own files are passed through as snippets; each top-level
+    subdirectory contributes one item holding its cached or fresh summary.
+    Returns (items, stats).
+    """
+    root = Path(root).expanduser().resolve()
+    hashes_path = root_cache_path(cache_dir, "file_hashes", root)
+    summaries_path = root_cache_path(cache_dir, "dir_summaries", root)
+    hash_cache = load_json_cache(hashes_path)
+    summaries = load_json_cache(summaries_path)
+
+    stats, used, items = {}, set(), []
+    tree = None
+    try:
+        tree = build_tree(root, hash_cache)
+        if tree:
+            top_files = [p for p, _ in tree["files"][:MAX_FILES_PER_DIR]]
+            items.extend(
+                {"path": s["path"], "name": s["name"], "snippet": s["snippet"]}
+                for s in build_context_snippets(top_files, per_file_chars=per_file_chars)
+            )
+            for child in tree["dirs"]:
+                text = summarize_node(child, root, summarize, summaries, used, stats, key_salt, per_file_chars)
+                if text:
+                    items.append({"path": str(child["path"]), "name": child["path"].name + "/", "snippet": text})
+    except BaseException:
+        # Keep whatever was hashed or summarized so a retry picks up from here
+        save_json_cache(hashes_path, hash_cache)
+        save_json_cache(summaries_path, summaries)
+        raise
+
+    # Drop entries for files and directories that are no longer in this tree
+    live_files = set()
+    stack = [tree] if tree else []
+    while stack:
+        n = stack.pop()
+        live_files.update(str(p) for p, _ in n["files"])
+        stack.extend(n["dirs"])
+    stats["files"] = len(live_files)
+    save_json_cache(hashes_path, {k: v for k, v in hash_cache.items() if k in live_files})
+    save_json_cache(summaries_path, {k: v for k, v in summaries.items() if k in used})
+    return items, stats
@@ -0,0 +1,123 @@
+"""
+Fold bursts of near-identical photos into one representative each.
+
+Each image gets a 64-bit dHash (gradient of a 9x8 thumbnail) and pHash
+(low-frequency DCT of a 32x32 thumbnail), cached per file by size and mtime.
+Two images are near-duplicates when both hashes are within the Hamming
+threshold. Images are compared one at a time against the cluster leaders
+seen so far, so memory grows with the number of distinct shots kept rather
+than quadratically with the folder. Needs Pillow and NumPy; without them
+every image is kept.
+"""
+from pathlib import Path
+from utils import IMAGE_EXTS, DEFAULT_CACHE_DIR, root_cache_path, load_json_cache, save_json_cache
+
+HASH_VERSION = "2"
+DEFAULT_THRESHOLD = 10  # max differing bits (of 64) for both hashes
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # optional; dedup is skipped
+    np = None
+    Image = None
+
+_DCT = None
+_POPCOUNT = None
+
+def _dct_matrix(n: int = 32):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m
+
+def _image_hashes(path: Path):
+    """Return (dhash_hex, phash_hex) for one image."""
+    global _DCT
+    if _DCT is None:
+        _DCT = _dct_matrix(32)
+    with Image.open(path) as im:
+        im.draft("L", (128, 128))  # JPEG: decode at reduced scale, much cheaper
+        gray = im.convert("L")
+        d = np.asarray(gray.resize((9, 8), Image.BILINEAR), dtype=np.int16)
+        p = np.asarray(gray.resize((32, 32), Image.BILINEAR), dtype=np.float64)
+    dbits = (d[:, 1:] > d[:, :-1]).ravel()
+    low = (_DCT @ p @ _DCT.T)[:8, :8].ravel()
+    pbits = low > np.median(low[1:])  # skip the DC term
+    return np.packbits(dbits).tobytes().hex(), np.packbits(pbits).tobytes().hex()
+
+def _cached_hashes(p: Path, cache: dict):
+    """(dhash_hex, phash_hex) for p, recomputed only when size/mtime change."""
+    st = p.stat()
+    key = str(p)
+    entry = cache.get(key)
+    if not (entry and entry[0] == HASH_VERSION and entry[1] == st.st_size and entry[2] == st.st_mtime_ns):
+        entry = [HASH_VERSION, st.st_size, st.st_mtime_ns, *_image_hashes(p)]
+        cache[key] = entry
+    return entry[3], entry[4]
+
+def _popcount_table():
+    global _POPCOUNT
+    if _POPCOUNT is None:
+        _POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(1).astype(np.uint8)
+    return _POPCOUNT
+
+def iter_unique_images(paths, counts: dict, root: Path, cache_dir=DEFAULT_CACHE_DIR, threshold: int = DEFAULT_THRESHOLD):
+    """
+    Yield non-image paths unchanged and the first image of each near-duplicate
+    cluster; later near-duplicates are dropped and only bump counts[leader].
+    Because it only looks backwards, the representative is the first shot seen
+    rather than the largest, and counts cover the part of the stream that was
+    actually consumed. Hashes are cached per scan root, keeping only the images
+    seen in this run.
+    """
+    if np is None:
+        try:
+            yield from paths
+        finally:
+            close = getattr(paths, "close", None)
+            if close:
+                close()
+        return
+
+    cache_path = root_cache_path(cache_dir, "image_hashes", Path(root).expanduser().resolve())
+    cache = load_json_cache(cache_path)
+    seen = set()
+    popcount = _popcount_table()
+    leaders_d = np.empty((64, 8), dtype=np.uint8)
+    leaders_p = np.empty((64, 8), dtype=np.uint8)
+    leader_paths = []
+    try:
+        for p in paths:
+            if p.suffix.lower() not in IMAGE_EXTS:
+                yield p
+                continue
+            seen.add(str(p))
+            try:
+                dhex, phex = _cached_hashes(p, cache)
+            except Exception:
+                counts[p] = 1  # not decodable; pass it through alone
+                yield p
+                continue
+            d = np.frombuffer(bytes.fromhex(dhex), dtype=np.uint8)
+            ph = np.frombuffer(bytes.fromhex(phex), dtype=np.uint8)
+            n = len(leader_paths)
+            if n:
+                near = (popcount[leaders_d[:n] ^ d].sum(1) <= threshold) & (popcount[leaders_p[:n] ^ ph].sum(1) <= threshold)
+                hit = np.flatnonzero(near)
+                if hit.size:
+                    counts[leader_paths[hit[0]]] += 1
+                    continue
+            if n == len(leaders_d):
+                leaders_d = np.concatenate([leaders_d, np.empty_like(leaders_d)])
+                leaders_p = np.concatenate([leaders_p, np.empty_like(leaders_p)])
+            leaders_d[n], leaders_p[n] = d, ph
+            leader_paths.append(p)
+            counts[p] = 1
+            yield p
+    finally:
+        # Runs when the consumer stops early too (generator close)
+        close = getattr(paths, "close", None)
+        if close:
+            close()
+        save_json_cache(cache_path, {k: v for k, v in cache.items() if k in seen})
@@ -153,8 +153,10 @@ def generate_single_scene_image(description: str, api_key: str = None) -> Image.
     
     try:
         # Make the API request
+        # OPENAI_BASE_URL lets the load-test harness point this at a local stub
+        base_url = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
         response = requests.post(
-            'https://api.openai.com/v1/images/generations',
+            f'{base_url}/images/generations',
             headers=headers,
             json=payload,
             timeout=60
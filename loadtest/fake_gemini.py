@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the `gemini` CLI used by the load-test harness.
+
+Accepts the same input as the real CLI (--model, and the prompt on stdin or
+via --prompt), sleeps for a configurable latency and prints a canned
+analysis JSON. Behaviour is tuned
+through environment variables so the harness can set it per run:
+
+  FAKE_GEMINI_LATENCY_MS   base latency per call (default 200)
+  FAKE_GEMINI_JITTER_MS    uniform extra latency 0..N ms (default 0)
+  FAKE_GEMINI_ERROR_RATE   probability of a failing call, 0..1 (default 0)
+  FAKE_GEMINI_PAD_BYTES    extra bytes added to the response (default 0)
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+THEMES = ["AI Engineering", "Quant Finance", "Classical Music", "Underwater Photography"]
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+def _evidence_refs(prompt: str, limit: int = 12):
+    """Pick evidence refs the way a model would: file ids or file names from the payload."""
+    refs = re.findall(r"^(f\d+) ", prompt, flags=re.M)
+    if not refs:
+        refs = re.findall(r'"name": "([^"]+)"', prompt)
+    return refs[:limit] or ["notes.md"]
+
+def build_analysis(prompt: str, pad_bytes: int = 0) -> dict:
+    refs = _evidence_refs(prompt)
+    analysis = {
+        "themes": [
+            {"name": t, "evidence": [refs[(i + k) % len(refs)] for k in range(min(3, len(refs)))]}
+            for i, t in enumerate(THEMES)
+        ],
+        "future_identities": [
+            {"title": f"{t} Practitioner", "why": f"Your files keep returning to {t.lower()}."}
+            for t in THEMES[:3]
+        ],
+        "affirmations": [f"I make steady progress in {t.lower()}." for t in THEMES],
+        "action_prompts": ["Spend 20 minutes on your newest project.", "Write down one goal for this week."],
+        "vision_board_scenes": [
+            {
+                "theme": t,
+                "success_visualization": f"Recognised for excellent work in {t.lower()}.",
+                "image_description": f"A confident professional thriving in {t.lower()}, bright studio light.",
+            }
+            for t in THEMES
+        ],
+    }
+    if pad_bytes > 0:
+        analysis["padding"] = "x" * pad_bytes
+    return analysis
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake gemini CLI for load tests.")
+    ap.add_argument("--model", default="gemini-2.5-flash")
+    ap.add_argument("--prompt", "-p", default=None)
+    args, _ = ap.parse_known_args()
+
+    latency = _env_float("FAKE_GEMINI_LATENCY_MS", 200) + random.uniform(0, _env_float("FAKE_GEMINI_JITTER_MS", 0))
+    time.sleep(latency / 1000.0)
+
+    if random.random() < _env_float("FAKE_GEMINI_ERROR_RATE", 0):
+        print("fake gemini: simulated failure", file=sys.stderr)
+        sys.exit(1)
+
+    prompt = args.prompt if args.prompt is not None else sys.stdin.read()
+    pad = int(_env_float("FAKE_GEMINI_PAD_BYTES", 0))
+    print(json.dumps(build_analysis(prompt, pad), separators=(",", ":")))
+
+if __name__ == "__main__":
+    main()
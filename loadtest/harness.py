@@ -0,0 +1,178 @@
+"""
+Offline load test for the full app_direct pipeline.
+
+Puts a fake `gemini` executable first on PATH, starts the local image-API
+stand-in, then runs app_direct.py end to end --runs times with at most
+--concurrency runs in flight. Reports latency percentiles, throughput and
+child-process resource usage, plus per-call model latency. Unrecognised
+flags are forwarded to app_direct.py (e.g. --prompt-format compact, or
+--backend http to hit the stub's generateContent endpoint instead).
+
+  python3 loadtest/harness.py --runs 40 --concurrency 8 --generate-image
+  python3 loadtest/harness.py --runs 40 --backend http
+"""
+import os
+import re
+import sys
+import math
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+from stub_server import start_stub_server
+
+MODEL_LATENCY = re.compile(r"^\[gemini\] backend=\S+ latency_ms=(\d+)", re.M)
+
+HERE = Path(__file__).resolve().parent
+APP = HERE.parent / "app_direct.py"
+
+WORDS = ("portfolio backtest sharpe volatility neural network transformer embedding "
+         "sonata etude tempo scales reef dive camera lens aperture marathon tempo run").split()
+
+def make_synthetic_tree(root: Path, n_files: int, seed: int = 0):
+    """Create a small nested tree of text files to scan."""
+    rnd = random.Random(seed)
+    kinds = [".md", ".txt", ".py", ".csv", ".json"]
+    for i in range(n_files):
+        d = root / f"area{i % 7}" / f"sub{i % 3}"
+        d.mkdir(parents=True, exist_ok=True)
+        ext = kinds[i % len(kinds)]
+        text = " ".join(rnd.choice(WORDS) for _ in range(60))
+        if ext == ".md":
+            body = f"# {text[:30]}\n\n{text}\n"
+        elif ext == ".py":
+            body = f'"""{text[:50]}"""\n\ndef run_{i}(x):\n    return x\n'
+        elif ext == ".csv":
+            body = "date,value,label\n" + "".join(f"2024-01-{k % 28 + 1:02d},{k},{rnd.choice(WORDS)}\n" for k in range(50))
+        elif ext == ".json":
+            body = '{"title": "%s", "tags": ["%s"], "notes": "%s"}' % (rnd.choice(WORDS), rnd.choice(WORDS), text[:80])
+        else:
+            body = text
+        (d / f"file_{i}{ext}").write_text(body, encoding="utf-8")
+
+def install_fake_gemini(bin_dir: Path) -> Path:
+    """Write a `gemini` launcher for fake_gemini.py into bin_dir."""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    fake = HERE / "fake_gemini.py"
+    if os.name == "nt":
+        launcher = bin_dir / "gemini.cmd"
+        launcher.write_text(f'@"{sys.executable}" "{fake}" %*\r\n', encoding="utf-8")
+    else:
+        launcher = bin_dir / "gemini"
+        launcher.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{fake}" "$@"\n', encoding="utf-8")
+        launcher.chmod(0o755)
+    return launcher
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    k = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[k]
+
+def run_once(i: int, root: str, work: Path, env: dict, extra: list):
+    out_dir = work / f"run_{i}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, str(APP), root, "--no-ascii",
+           "--out", str(out_dir / "vision-board.html"),
+           "--image-out", str(out_dir / "vision-board.png")] + extra
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    ok = proc.returncode == 0
+    err = "" if ok else (proc.stderr.strip().splitlines() or ["exit %d" % proc.returncode])[-1]
+    calls = [float(ms) / 1000.0 for ms in MODEL_LATENCY.findall(proc.stdout)]
+    return elapsed, ok, err, calls
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline load test for app_direct with local Gemini/image stand-ins.",
+                                 allow_abbrev=False)  # never swallow flags meant for app_direct
+    ap.add_argument("--root", help="Folder to scan (default: a generated synthetic tree)")
+    ap.add_argument("--files", type=int, default=200, help="Files in the synthetic tree")
+    ap.add_argument("--runs", type=int, default=20, help="Total pipeline runs")
+    ap.add_argument("--concurrency", type=int, default=4, help="Runs in flight at once")
+    ap.add_argument("--gemini-latency-ms", type=float, default=200)
+    ap.add_argument("--gemini-jitter-ms", type=float, default=0)
+    ap.add_argument("--gemini-error-rate", type=float, default=0.0)
+    ap.add_argument("--gemini-pad-bytes", type=int, default=0, help="Extra bytes in each fake model response")
+    ap.add_argument("--image-latency-ms", type=float, default=500)
+    ap.add_argument("--image-jitter-ms", type=float, default=0)
+    ap.add_argument("--image-error-rate", type=float, default=0.0)
+    ap.add_argument("--image-px", type=int, default=256, help="Width/height of stub PNGs")
+    ap.add_argument("--keep", action="store_true", help="Keep the work directory")
+    args, extra = ap.parse_known_args()
+
+    work = Path(tempfile.mkdtemp(prefix="vb-loadtest-"))
+    root = args.root
+    if not root:
+        root = str(work / "data")
+        make_synthetic_tree(Path(root), args.files)
+        print(f"[load] Synthetic tree: {args.files} files in {root}")
+
+    server = start_stub_server(latency_ms=args.image_latency_ms, jitter_ms=args.image_jitter_ms,
+                               error_rate=args.image_error_rate, image_px=args.image_px,
+                               gemini_latency_ms=args.gemini_latency_ms, gemini_jitter_ms=args.gemini_jitter_ms,
+                               gemini_error_rate=args.gemini_error_rate, gemini_pad_bytes=args.gemini_pad_bytes)
+    host, port = server.server_address[:2]
+    bin_dir = work / "bin"
+    install_fake_gemini(bin_dir)
+
+    env = dict(os.environ)
+    env["PATH"] = str(bin_dir) + os.pathsep + env.get("PATH", "")
+    env["OPENAI_API_KEY"] = "stub-key"
+    env["OPENAI_BASE_URL"] = f"http://{host}:{port}/v1"
+    env["GOOGLE_API_KEY"] = "stub-key"
+    env["GEMINI_BASE_URL"] = f"http://{host}:{port}/v1beta"
+    env["FAKE_GEMINI_LATENCY_MS"] = str(args.gemini_latency_ms)
+    env["FAKE_GEMINI_JITTER_MS"] = str(args.gemini_jitter_ms)
+    env["FAKE_GEMINI_ERROR_RATE"] = str(args.gemini_error_rate)
+    env["FAKE_GEMINI_PAD_BYTES"] = str(args.gemini_pad_bytes)
+
+    print(f"[load] {args.runs} runs, concurrency {args.concurrency}, extra args: {' '.join(extra) or '-'}")
+    if not any(a == "--cache-dir" or a.startswith("--cache-dir=") for a in extra):
+        # Keep scan caches out of ~/.cache so rmtree(work) cleans them up
+        extra = extra + ["--cache-dir", str(work / "cache")]
+    usage_before = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda i: run_once(i, root, work, env, extra), range(args.runs)))
+    wall = time.perf_counter() - start
+    usage_after = resource.getrusage(resource.RUSAGE_CHILDREN) if resource else None
+    server.shutdown()
+
+    latencies = [r[0] for r in results if r[1]]
+    failures = [r[2] for r in results if not r[1]]
+    model_calls = [c for r in results for c in r[3]]
+    print()
+    print(f"[load] ok: {len(latencies)}  failed: {len(failures)}  wall: {wall:.2f}s")
+    print(f"[load] throughput: {len(results) / wall:.2f} runs/s")
+    if latencies:
+        print("[load] latency s: p50 {:.3f}  p90 {:.3f}  p99 {:.3f}  max {:.3f}".format(
+            percentile(latencies, 50), percentile(latencies, 90), percentile(latencies, 99), max(latencies)))
+    if model_calls:
+        print("[load] model call s ({} calls): p50 {:.3f}  p90 {:.3f}  p99 {:.3f}".format(
+            len(model_calls), percentile(model_calls, 50), percentile(model_calls, 90), percentile(model_calls, 99)))
+    if usage_before and usage_after:
+        cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+        rss_mb = usage_after.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+        print(f"[load] child CPU: {cpu:.2f}s ({cpu / max(len(results), 1):.3f}s/run)  peak child RSS: {rss_mb:.1f} MB")
+    print(f"[load] stub requests: {server.counts or {}}")
+    for err in sorted(set(failures))[:5]:
+        print(f"[load] failure: {err}")
+
+    if args.keep:
+        print(f"[load] Work dir kept: {work}")
+    else:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Local stand-ins for the HTTP APIs the pipeline calls, for the load-test harness.
+
+Serves POST /v1/images/generations (returns a URL on this server),
+GET /images/<id>.png (a noise PNG of the configured size) and
+POST /v1beta/models/<model>:generateContent (the canned analysis from
+fake_gemini), each with configurable latency, jitter and error rate.
+Point image_generator at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+and the http Gemini backend with GEMINI_BASE_URL=http://127.0.0.1:<port>/v1beta.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import zlib
+import random
+import struct
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fake_gemini import build_analysis
+
+GENERATE_CONTENT = re.compile(r"^/v1beta/models/[^/:]+:generateContent$")
+
+def make_png(px: int) -> bytes:
+    """Encode a px x px RGB noise image as PNG (noise keeps the payload ~px*px*3 bytes)."""
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+    raw = b"".join(b"\x00" + os.urandom(px * 3) for _ in range(px))
+    ihdr = struct.pack(">IIBBBBB", px, px, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment so keep-alive clients don't
+    # measure Nagle/delayed-ACK stalls instead of the configured latency
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, fmt, *args):
+        pass  # keep harness output readable
+
+    def _delay_and_maybe_fail(self, endpoint: str) -> bool:
+        cfg = self.server.config[endpoint]
+        time.sleep((cfg["latency_ms"] + random.uniform(0, cfg["jitter_ms"])) / 1000.0)
+        if random.random() < cfg["error_rate"]:
+            self._send(500, json.dumps({"error": {"message": "stub: simulated failure"}}).encode(), "application/json")
+            return True
+        return False
+
+    def _send(self, status: int, body: bytes, ctype: str):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self, key: str):
+        with self.server.lock:
+            self.server.counts[key] = self.server.counts.get(key, 0) + 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if GENERATE_CONTENT.match(path):
+            self._count("gemini/generateContent")
+            if self._delay_and_maybe_fail("gemini"):
+                return
+            try:
+                prompt = json.loads(raw)["contents"][0]["parts"][0]["text"]
+            except (ValueError, KeyError, IndexError):
+                self._send(400, b'{"error": {"message": "bad request"}}', "application/json")
+                return
+            text = json.dumps(build_analysis(prompt, self.server.config["gemini"]["pad_bytes"]))
+            body = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+            self._send(200, json.dumps(body).encode(), "application/json")
+        elif path == "/v1/images/generations":
+            self._count("images/generations")
+            if self._delay_and_maybe_fail("images"):
+                return
+            host, port = self.server.server_address[:2]
+            body = {"created": int(time.time()), "data": [{"url": f"http://{host}:{port}/images/{uuid.uuid4().hex}.png"}]}
+            self._send(200, json.dumps(body).encode(), "application/json")
+        else:
+            self._send(404, b'{"error": "not found"}', "application/json")
+
+    def do_GET(self):
+        if self.path.startswith("/images/"):
+            self._count("images/download")
+            self._send(200, self.server.png, "image/png")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 500,
+                      jitter_ms: float = 0, error_rate: float = 0.0, image_px: int = 256,
+                      gemini_latency_ms: float = 200, gemini_jitter_ms: float = 0,
+                      gemini_error_rate: float = 0.0, gemini_pad_bytes: int = 0):
+    """Start the stub server on a daemon thread and return it (server.server_address has the port)."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.config = {
+        "images": {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate},
+        "gemini": {"latency_ms": gemini_latency_ms, "jitter_ms": gemini_jitter_ms,
+                   "error_rate": gemini_error_rate, "pad_bytes": gemini_pad_bytes},
+    }
+    server.png = make_png(image_px)
+    server.counts = {}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the local image-API stand-in.")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=500)
+    ap.add_argument("--jitter-ms", type=float, default=0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--image-px", type=int, default=256, help="Width/height of returned PNGs")
+    ap.add_argument("--gemini-latency-ms", type=float, default=200)
+    ap.add_argument("--gemini-jitter-ms", type=float, default=0)
+    ap.add_argument("--gemini-error-rate", type=float, default=0.0)
+    ap.add_argument("--gemini-pad-bytes", type=int, default=0)
+    args = ap.parse_args()
+    server = start_stub_server(port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               error_rate=args.error_rate, image_px=args.image_px,
+                               gemini_latency_ms=args.gemini_latency_ms, gemini_jitter_ms=args.gemini_jitter_ms,
+                               gemini_error_rate=args.gemini_error_rate, gemini_pad_bytes=args.gemini_pad_bytes)
+    port = server.server_address[1]
+    print(f"[stub] Images: http://127.0.0.1:{port}/v1  Gemini: http://127.0.0.1:{port}/v1beta (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -52,7 +52,9 @@ def render_ascii_board(analysis: dict) -> str:
     lines.append("")
     return "\n".join(lines)
 
-def render_html(analysis: dict, out_path: str = "vision-board.html", source_folder: str = None, generate_ai_images: bool = False):
+def render_html(analysis: dict, out_path: str = "vision-board.html", source_folder: str = None, generate_ai_images: bool = False,
+                image_counts: dict = None):
+    # image_counts: evidence ref -> number of near-duplicate shots it stands for
     # Create images directory and copy referenced images
     html_dir = Path(out_path).parent
     images_dir = html_dir / "vision_board_images"
@@ -68,6 +70,7 @@ def render_html(analysis: dict, out_path: str = "vision-board.html", source_fold
                     src_file = source_path / evidence
                     if src_file.exists():
                         dst_file = images_dir / evidence
+                        dst_file.parent.mkdir(parents=True, exist_ok=True)
                         shutil.copy2(src_file, dst_file)
                         copied_images[evidence] = f"vision_board_images/{evidence}"
     
@@ -126,6 +129,8 @@ def render_html(analysis: dict, out_path: str = "vision-board.html", source_fold
   .vision-desc {{ font-style: italic; color: #b8c5d1; margin-top: 8px; font-size: 14px; }}
   .evidence-images {{ margin-top: 12px; }}
   .evidence-img {{ max-width: 100%; height: 120px; object-fit: cover; border-radius: 8px; margin: 4px; }}
+  .burst {{ position: relative; display: inline-block; }}
+  .burst-count {{ position: absolute; right: 10px; bottom: 10px; background: rgba(0,0,0,.7); color: #fff; border-radius: 999px; padding: 2px 8px; font-size: 12px; }}
 </style>
 </head>
 <body>
@@ -138,7 +143,7 @@ def render_html(analysis: dict, out_path: str = "vision-board.html", source_fold
     <div class="section">
       <h2>Themes</h2>
       <div class="grid">
-        {''.join(theme_card(t, copied_images) for t in analysis.get('themes', [])[:8])}
+        {''.join(theme_card(t, copied_images, image_counts) for t in analysis.get('themes', [])[:8])}
       </div>
     </div>
 
@@ -171,9 +176,11 @@ def render_html(analysis: dict, out_path: str = "vision-board.html", source_fold
     Path(out_path).write_text(html, encoding="utf-8")
     return out_path
 
-def theme_card(t, copied_images=None):
+def theme_card(t, copied_images=None, image_counts=None):
     if copied_images is None:
         copied_images = {}
+    if image_counts is None:
+        image_counts = {}
     
     ev = t.get("evidence", [])[:3]
     
@@ -189,7 +196,12 @@ def theme_card(t, copied_images=None):
             # Use relative path if image was copied, otherwise show filename
             if img in copied_images:
                 img_path = copied_images[img]
-                images_html += f'<img src="{img_path}" alt="{escape_html(img)}" class="evidence-img" title="{escape_html(img)}">'
+                count = image_counts.get(img, 1)
+                title = escape_html(img) + (f" ({count} similar shots)" if count > 1 else "")
+                img_tag = f'<img src="{img_path}" alt="{escape_html(img)}" class="evidence-img" title="{title}">'
+                if count > 1:
+                    img_tag = f'<span class="burst">{img_tag}<span class="burst-count">×{count}</span></span>'
+                images_html += img_tag
             else:
                 # Fallback to pill if image couldn't be copied
                 other_evidence.append(img)
@@ -1,4 +1,10 @@
 import os
+import re
+import json
+import hashlib
+import mmap
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 
 TEXT_EXTS = {
@@ -7,17 +13,15 @@ TEXT_EXTS = {
 }
 IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}  # NEW
 
-def list_files(root: str, max_files: int = 80):
+def iter_files(root: str):
+    """Lazily walk root, yielding readable text/image files; stops walking when the consumer stops pulling."""
     p = Path(root).expanduser().resolve()
-    files = []
     for dirpath, _, filenames in os.walk(p):
         for fn in filenames:
-            if len(files) >= max_files:
-                return files
             ext = Path(fn).suffix.lower()
             if ext in TEXT_EXTS or ext in IMAGE_EXTS:  # include images
-                files.append(Path(dirpath) / fn)
-    return files
+                yield Path(dirpath) / fn
+
 
 def _read_text_file(path: Path, max_bytes: int = 32_000) -> str:
     try:
@@ -27,6 +31,200 @@ def _read_text_file(path: Path, max_bytes: int = 32_000) -> str:
     except Exception:
         return ""
 
+# ----- Budget-driven snippet extraction -----
+# Only touch as many bytes as the final snippet needs. Large files with an
+# extractor are memory-mapped so outline scans and CSV sampling only fault in
+# the pages they look at; smaller ones are read up to the outline scan cap, and
+# files without an extractor read just the budget's worth of bytes.
+OUTLINE_SCAN_BYTES = 256 * 1024  # cap for heading/signature/key scans
+MMAP_MIN_BYTES = 1024 * 1024  # below this a plain read is as fast and can't SIGBUS
+CSV_SAMPLE_ROWS = 3
+SNIPPET_SEP = " | "
+
+_PY_SIG = re.compile(r"^\s*((?:async\s+)?def\s+\w+\s*\([^)]*\)?|class\s+\w+[^:]*)")
+_JS_SIG = re.compile(
+    r"^\s*((?:export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s*\w*\s*\([^)]*\)?"
+    r"|(?:export\s+)?(?:default\s+)?class\s+\w+[^{]*"
+    r"|(?:export\s+)?(?:const|let)\s+\w+\s*=\s*(?:async\s+)?\([^)]*\)\s*=>)"
+)
+_MD_HEADING = re.compile(r"^#{1,6}\s+(.*)")
+_JSON_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"\s*:?|[{}\[\]]')
+
+@contextmanager
+def _open_buffer(path: Path, max_bytes: int = None):
+    """
+    Yield a bytes-like view of the file: the first max_bytes bytes, or with
+    max_bytes=None the first OUTLINE_SCAN_BYTES of a small file or the whole
+    of a large one mmapped (pages load lazily as they are scanned).
+    """
+    with open(path, "rb") as f:
+        if max_bytes is not None:
+            yield f.read(max_bytes)
+            return
+        size = os.fstat(f.fileno()).st_size
+        if size <= MMAP_MIN_BYTES:
+            yield f.read(min(size, OUTLINE_SCAN_BYTES))
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+def _decode(chunk) -> str:
+    return bytes(chunk).decode("utf-8", errors="ignore")
+
+def _iter_lines(buf, start: int = 0, end: int = None):
+    end = len(buf) if end is None else min(end, len(buf))
+    pos = start
+    while pos < end:
+        nl = buf.find(b"\n", pos, end)
+        stop = end if nl == -1 else nl
+        yield _decode(buf[pos:stop]).rstrip("\r")
+        pos = stop + 1
+
+def _join_until(parts, budget: int) -> str:
+    """Join parts with SNIPPET_SEP, stopping once the budget is reached."""
+    out, used = [], 0
+    for p in parts:
+        p = " ".join(p.split())
+        if not p:
+            continue
+        out.append(p)
+        used += len(p) + len(SNIPPET_SEP)
+        if used >= budget:
+            break
+    return SNIPPET_SEP.join(out)[:budget]
+
+def _head_text(buf, budget: int) -> str:
+    # UTF-8 is at most 4 bytes per char, so this always covers the budget.
+    return _decode(buf[: budget * 4])[:budget]
+
+def _extract_markdown(buf, budget: int) -> str:
+    def headings():
+        fence = None
+        for line in _iter_lines(buf, 0, OUTLINE_SCAN_BYTES):
+            s = line.lstrip()
+            if s.startswith(("```", "~~~")):
+                if fence is None:
+                    fence = s[:3]
+                elif s.startswith(fence):
+                    fence = None
+                continue
+            if fence is None:
+                m = _MD_HEADING.match(line)
+                if m:
+                    yield m.group(1).rstrip("#").strip()
+    return _join_until(headings(), budget)
+
+def _extract_python(buf, budget: int) -> str:
+    def parts():
+        want_doc = True  # module docstring, then the one after each def/class
+        lines = _iter_lines(buf, 0, OUTLINE_SCAN_BYTES)
+        for line in lines:
+            s = line.strip()
+            if not s:
+                continue
+            if want_doc and s[:3] in ('"""', "'''"):
+                q = s[:3]
+                doc = s[3:].split(q)[0].strip() or next(lines, "").strip().split(q)[0].strip()
+                if doc:
+                    yield doc
+                want_doc = False
+                continue
+            m = _PY_SIG.match(line)
+            if m:
+                yield m.group(1).strip()
+                want_doc = True
+            elif not s.startswith(("#", "@")):
+                want_doc = False
+    return _join_until(parts(), budget)
+
+def _extract_js(buf, budget: int) -> str:
+    def parts():
+        for line in _iter_lines(buf, 0, OUTLINE_SCAN_BYTES):
+            s = line.strip()
+            if s.startswith("/**") or (s.startswith("*") and not s.startswith("*/")):
+                doc = s.lstrip("/*").strip()
+                if doc.endswith("*/"):
+                    doc = doc[:-2].rstrip()
+                if doc and not doc.startswith("@"):
+                    yield doc
+                continue
+            m = _JS_SIG.match(line)
+            if m:
+                yield m.group(1).strip()
+    return _join_until(parts(), budget)
+
+def _line_at(buf, offset: int) -> str:
+    """Return the first complete line starting after offset."""
+    nl = buf.find(b"\n", offset)
+    if nl == -1:
+        return ""
+    return next(_iter_lines(buf, nl + 1, nl + 1 + 4096), "")
+
+def _extract_csv(buf, budget: int) -> str:
+    size = len(buf)
+    header = next(_iter_lines(buf, 0, 4096), "")
+    if not header:
+        return ""
+    rows = [header]
+    # Sample rows spread across the file instead of just the first few.
+    seen = set()
+    for i in range(CSV_SAMPLE_ROWS):
+        offset = (size * i) // CSV_SAMPLE_ROWS
+        row = _line_at(buf, offset)
+        if row and row != header and row not in seen:
+            seen.add(row)
+            rows.append(row)
+    return _join_until(rows, budget)
+
+def _extract_json(buf, budget: int) -> str:
+    """List top-level keys (or the keys of the first element of a top-level array)."""
+    depth, target, keys = 0, 1, []
+    # pos/endpos bound the scan without copying the window out of the buffer
+    for m in _JSON_TOKEN.finditer(buf, 0, min(len(buf), OUTLINE_SCAN_BYTES)):
+        tok = m.group(0)
+        if tok in (b"{", b"["):
+            if depth == 0 and tok == b"[":
+                target = 2
+            depth += 1
+        elif tok in (b"}", b"]"):
+            depth -= 1
+            if depth < target:
+                break
+        elif depth == target and tok.endswith(b":"):
+            keys.append(_decode(tok.rstrip(b": \t\r\n")[1:-1]))
+            if sum(len(k) + 2 for k in keys) >= budget:
+                break
+    if not keys:
+        return ""
+    prefix = "[{" if target == 2 else "{"
+    return (prefix + ", ".join(keys))[:budget]
+
+SNIPPET_EXTRACTORS = {
+    ".md": _extract_markdown,
+    ".py": _extract_python,
+    ".js": _extract_js,
+    ".ts": _extract_js,
+    ".tsx": _extract_js,
+    ".csv": _extract_csv,
+    ".json": _extract_json,
+}
+
+def read_snippet(path: Path, max_chars: int = 200) -> str:
+    """
+    Read just enough of a text file to fill max_chars, preferring a
+    structured outline (headings, signatures, CSV samples, JSON keys)
+    over the raw head of the file when one is available.
+    """
+    extractor = SNIPPET_EXTRACTORS.get(path.suffix.lower())
+    # UTF-8 is at most 4 bytes per char, so max_chars * 4 always covers the budget
+    max_bytes = None if extractor else max_chars * 4
+    try:
+        with _open_buffer(path, max_bytes) as buf:
+            text = extractor(buf, max_chars) if extractor else ""
+            return text or _head_text(buf, max_chars)
+    except (OSError, ValueError):
+        return ""
+
 def _read_pdf(path: Path, max_pages: int = 1) -> str:
     try:
         from pypdf import PdfReader
@@ -63,24 +261,69 @@ def _image_meta_snippet(path: Path) -> str:
     except Exception:
         return base  # no Pillow or no EXIF
 
-def safe_read(path: Path, max_bytes: int = 32_000) -> str:
+def safe_read(path: Path, max_bytes: int = 32_000, max_chars: int = None) -> str:
     ext = path.suffix.lower()
     if ext == ".pdf":
         return _read_pdf(path)
     if ext in IMAGE_EXTS:
         return _image_meta_snippet(path)  # use metadata/filename as “snippet”
+    if max_chars is not None:
+        return read_snippet(path, max_chars=max_chars)
     return _read_text_file(path, max_bytes=max_bytes)
 
+def iter_context_snippets(paths, per_file_chars: int = 200):
+    """
+    Yield one snippet item per path, reading each file only when the consumer
+    asks for the next item. Closing this generator closes paths too, so the
+    walk and any filters upstream stop as soon as the consumer does.
+    """
+    try:
+        for p in paths:
+            snippet = (safe_read(p, max_chars=per_file_chars) or p.stem)[:per_file_chars]
+            if not snippet.strip():
+                continue
+            yield {
+                "path": str(p),
+                "name": p.name,
+                "ext": p.suffix.lower(),
+                "snippet": snippet,
+            }
+    finally:
+        close = getattr(paths, "close", None)
+        if close:
+            close()
+
 def build_context_snippets(paths, per_file_chars: int = 200):  # tighter for speed
-    items = []
-    for p in paths:
-        snippet = (safe_read(p) or p.stem)[:per_file_chars]
-        if not snippet.strip():
-            continue
-        items.append({
-            "path": str(p),
-            "name": p.name,
-            "ext": p.suffix.lower(),
-            "snippet": snippet
-        })
-    return items
+    return list(iter_context_snippets(paths, per_file_chars))
+
+# ----- On-disk caches -----
+DEFAULT_CACHE_DIR = Path("~/.cache/vision-board").expanduser()
+
+def root_cache_path(cache_dir, name: str, root: Path) -> Path:
+    """Cache file for one scan root, so pruning a cache never touches another root's entries."""
+    tag = hashlib.sha1(str(root).encode("utf-8")).hexdigest()[:12]
+    return Path(cache_dir).expanduser() / f"{name}-{tag}.json"
+
+def load_json_cache(path: Path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_json_cache(path: Path, data: dict):
+    """Write atomically so an interrupted run never leaves a half-written cache."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique temp name: concurrent runs may save the same cache at once
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise